@@ -0,0 +1,291 @@
+import logging
+from bisect import bisect_left
+
+from fuzzywuzzy import fuzz
+
+from medication import MINUTES_PER_DAY, drug_name, format_time, parse_time
+
+logger = logging.getLogger(__name__)
+
+# ==============================
+# Spacing Rules
+# Minimum number of minutes that must separate doses of each pair, for
+# absorption/binding interactions that are managed by spacing the doses apart
+# rather than avoiding the combination. This is a separate table from
+# common_interactions in med-app.py: only the pairs marked [table] also appear
+# there, so keep the two in sync when either changes. Rules are symmetric, so
+# where a label gives different gaps before and after, the larger one is used.
+spacing_rules = {
+    # Levothyroxine labeling: take at least 4 h apart from iron, calcium and
+    # antacids
+    ("iron", "levothyroxine"): 240,  # [table]
+    ("calcium", "levothyroxine"): 240,
+    ("antacids", "levothyroxine"): 240,
+    # Oral iron labeling: avoid antacids within 2 h
+    ("antacids", "iron supplements"): 120,  # [table]
+    ("antacids", "iron"): 120,
+    # Digoxin labeling: antacids reduce absorption; separate by 2 h
+    ("antacids", "digoxin"): 120,  # [table]
+    # Tetracycline labeling: take 2 h apart from calcium products
+    ("calcium", "antibiotics"): 120,  # [table]
+    # Ciprofloxacin labeling: take 2 h before or 6 h after multivalent cations
+    ("calcium", "ciprofloxacin"): 360,
+    ("iron", "ciprofloxacin"): 360,
+    # NIH Office of Dietary Supplements (iron fact sheet): calcium reduces iron
+    # absorption; separate by 2 h
+    ("calcium", "iron"): 120,
+}
+
+# Rule keys each normalised drug name matched, cached per (drug ID, threshold)
+# so fuzzy matching runs once per distinct drug rather than once per dose.
+_rule_keys_cache = {}
+
+
+def _rule_keys(drug_id, threshold=80):
+    keys = _rule_keys_cache.get((drug_id, threshold))
+    if keys is None:
+        name = drug_name(drug_id)
+        keys = tuple(sorted({key for pair in spacing_rules for key in pair
+                             if fuzz.ratio(name, key) > threshold}))
+        _rule_keys_cache[(drug_id, threshold)] = keys
+    return keys
+
+
+def _partners():
+    partners = {}
+    for (key1, key2), gap in spacing_rules.items():
+        partners.setdefault(key1, []).append((key2, gap))
+        partners.setdefault(key2, []).append((key1, gap))
+    return partners
+
+
+def _circular_gap(t1, t2):
+    diff = abs(t1 - t2)
+    return min(diff, MINUTES_PER_DAY - diff)
+
+
+def _index_doses(regimen):
+    """Map each rule key to its doses as (minute, index), sorted by minute"""
+    buckets = {}
+    for idx in regimen.order():
+        for key in _rule_keys(regimen.drug_ids[idx]):
+            buckets.setdefault(key, []).append((regimen.minutes[idx], idx))
+    return buckets
+
+
+# ==============================
+# Conflict Detection
+def find_spacing_conflicts(regimen):
+    """Return dose pairs scheduled closer together than their rule allows.
+
+    Doses are bucketed by rule key in time order, then every dose on one side
+    of a rule binary-searches the other side's bucket for neighbours inside
+    the separation window (wrapping past midnight), so a regimen of n doses
+    costs O(n log n) plus the number of conflicts reported.
+    """
+    buckets = _index_doses(regimen)
+    found = {}
+    for (key1, key2), required in spacing_rules.items():
+        if key1 not in buckets or key2 not in buckets:
+            continue
+        others = buckets[key2]
+        other_minutes = [minute for minute, _ in others]
+        for minute, idx in buckets[key1]:
+            lo, hi = minute - required + 1, minute + required
+            if lo < 0:
+                window = [(lo + MINUTES_PER_DAY, MINUTES_PER_DAY), (0, hi)]
+            elif hi > MINUTES_PER_DAY:
+                window = [(lo, MINUTES_PER_DAY), (0, hi - MINUTES_PER_DAY)]
+            else:
+                window = [(lo, hi)]
+            for start, end in window:
+                for pos in range(bisect_left(other_minutes, start), bisect_left(other_minutes, end)):
+                    other_idx = others[pos][1]
+                    if other_idx == idx:
+                        continue
+                    pair = (min(idx, other_idx), max(idx, other_idx))
+                    if pair not in found or found[pair]["required"] < required:
+                        found[pair] = {
+                            "first": pair[0],
+                            "second": pair[1],
+                            "gap": _circular_gap(minute, others[pos][0]),
+                            "required": required,
+                            "rule": (key1, key2),
+                        }
+    return sorted(found.values(), key=lambda c: (regimen.minutes[c["first"]], c["first"], c["second"]))
+
+
+# ==============================
+# Rescheduling
+# Repeated doses of one drug are kept at least this far apart (or their
+# original gap, if smaller) so a reschedule never stacks them together.
+MIN_REPEAT_GAP = 240
+
+
+class _SearchLimit(Exception):
+    pass
+
+
+def _build_constraints(regimen, doses):
+    """Map each dose to {other dose: (required gap, same drug)}"""
+    partners = _partners()
+    constraints = {idx: {} for idx in doses}
+    for pos, idx in enumerate(doses):
+        keys = _rule_keys(regimen.drug_ids[idx])
+        for other in doses[pos + 1:]:
+            other_keys = _rule_keys(regimen.drug_ids[other])
+            required = max((gap for key in keys for other_key, gap in partners.get(key, ())
+                            if other_key in other_keys), default=0)
+            same_drug = regimen.drug_ids[idx] == regimen.drug_ids[other]
+            if same_drug:
+                original_gap = _circular_gap(regimen.minutes[idx], regimen.minutes[other])
+                required = max(required, min(original_gap, MIN_REPEAT_GAP))
+            if required or same_drug:
+                constraints[idx][other] = constraints[other][idx] = (required, same_drug)
+    return constraints
+
+
+def _compatible(t1, t2, rule, moved):
+    required, same_drug = rule
+    if _circular_gap(t1, t2) < required:
+        return False
+    # A dose that moves must never land on a time the same drug already uses
+    return not (same_drug and moved and t1 == t2)
+
+
+def _search(doses, domains, constraints, original, max_moves, budget):
+    """Backtracking search with forward checking over the candidate times.
+
+    Returns {dose: minute} moving at most ``max_moves`` doses, or None if no
+    such schedule exists. ``budget`` is a one-item list holding the number of
+    steps left; _SearchLimit is raised when it runs out.
+    """
+    position = {idx: pos for pos, idx in enumerate(doses)}
+    assignment = {}
+
+    def search(live, moves_left):
+        if not live:
+            return True
+        # Doses whose current time has already been ruled out must move
+        if sum(values[0] != original[idx] for idx, values in live.items()) > moves_left:
+            return False
+        # Most constrained dose first: the one with the fewest remaining times
+        idx = min(live, key=lambda i: (len(live[i]), position[i]))
+        for minute in live[idx]:
+            moved = minute != original[idx]
+            # The current time is always first, so nothing later fits either
+            if moved and not moves_left:
+                break
+            budget[0] -= 1
+            if budget[0] < 0:
+                raise _SearchLimit
+            rest = {}
+            for other, values in live.items():
+                if other == idx:
+                    continue
+                rule = constraints[idx].get(other)
+                if rule is not None:
+                    values = [t for t in values if _compatible(
+                        minute, t, rule, moved or t != original[other])]
+                    if not values:
+                        break
+                rest[other] = values
+            else:
+                assignment[idx] = minute
+                if search(rest, moves_left - moved):
+                    return True
+                del assignment[idx]
+        return False
+
+    return dict(assignment) if search({idx: domains[idx] for idx in doses}, max_moves) else None
+
+
+def _solve(doses, domains, constraints, original, max_nodes):
+    """Find a schedule for ``doses``, or None if there is none.
+
+    Schedules moving no dose are tried first, then one, then two, and so on,
+    so the result moves as few doses as possible. If that takes more than
+    ``max_nodes`` steps, a plain search with no limit on moves (and its own
+    ``max_nodes`` steps) is used instead, which still finds a schedule
+    whenever one exists but may move more doses than necessary.
+    """
+    budget = [max_nodes]
+    try:
+        for max_moves in range(len(doses) + 1):
+            found = _search(doses, domains, constraints, original, max_moves, budget)
+            if found is not None:
+                return found
+        return None
+    except _SearchLimit:
+        pass
+    try:
+        return _search(doses, domains, constraints, original, len(doses), [max_nodes])
+    except _SearchLimit:
+        logger.warning(f"Rescheduling search stopped after {max_nodes} steps")
+        return None
+
+
+def propose_schedule(regimen, step=15, earliest="06:00", latest="23:00", max_nodes=5000):
+    """Propose dose times that satisfy every spacing rule.
+
+    Every dose covered by a spacing rule is a variable whose candidate times
+    are its current time followed by each ``step``-minute slot between
+    ``earliest`` and ``latest``, nearest first. A backtracking search with
+    forward checking assigns them so that every spacing rule holds and
+    repeated doses of one drug stay apart (see MIN_REPEAT_GAP), moving as
+    few doses as possible (see _solve).
+
+    The search is exhaustive up to ``max_nodes`` steps. If it finds no
+    schedule (none exists, or the limit was hit first), the dose with the
+    most constraints is set aside as unresolved and the rest are solved
+    again; unresolved doses keep their current time and do not constrain the
+    others. Returns ``(changes, unresolved)`` where ``changes`` maps dose
+    index to its new minute of day.
+    """
+    earliest, latest = parse_time(earliest), parse_time(latest)
+    doses = [idx for idx in regimen.order() if _rule_keys(regimen.drug_ids[idx])]
+    original = {idx: regimen.minutes[idx] for idx in doses}
+    constraints = _build_constraints(regimen, doses)
+    slots = range(earliest, latest + 1, step)
+    domains = {
+        idx: [original[idx]] + sorted((t for t in slots if t != original[idx]),
+                                      key=lambda t, m=original[idx]: (_circular_gap(t, m), t))
+        for idx in doses
+    }
+
+    active = list(doses)
+    unresolved = []
+    while True:
+        solution = _solve(active, domains, constraints, original, max_nodes)
+        if solution is not None:
+            break
+        position = {idx: pos for pos, idx in enumerate(active)}
+        worst = max(active, key=lambda i: (sum(other in position for other in constraints[i]), position[i]))
+        logger.warning(f"No compatible time found for {regimen.names[worst]} at {format_time(original[worst])}")
+        active.remove(worst)
+        unresolved.append(worst)
+
+    changes = {idx: minute for idx, minute in solution.items() if minute != original[idx]}
+    unresolved.sort(key=doses.index)
+    return changes, unresolved
+
+
+# ==============================
+# Batch Audit
+def audit_population(regimens):
+    """Run the spacing analysis over many patients.
+
+    ``regimens`` maps a patient identifier to a Regimen; only patients with
+    conflicts appear in the result.
+    """
+    report = {}
+    for patient_id, regimen in regimens.items():
+        conflicts = find_spacing_conflicts(regimen)
+        if conflicts:
+            changes, unresolved = propose_schedule(regimen)
+            report[patient_id] = {
+                "conflicts": conflicts,
+                "changes": changes,
+                "unresolved": unresolved,
+            }
+    return report
@@ -9,6 +9,8 @@ import os
 import smtplib
 
 from email.mime.text import MIMEText
+from medication import Regimen, format_time, parse_time
+from dose_spacing import find_spacing_conflicts, propose_schedule
 import requests
 
 # Load environment variables from .env file if it exists
@@ -166,11 +168,10 @@ def schedule_reminders(meds):
     scheduler.remove_all_jobs()  # Clear existing jobs
     for med in meds:
         try:
-            time_str = med['med_time']
-            job_time = datetime.strptime(time_str, "%H:%M").time()
-            scheduler.add_job(remind, 'cron', args=[med], hour=job_time.hour, minute=job_time.minute)
+            minute = parse_time(med['med_time'])
+            scheduler.add_job(remind, 'cron', args=[med], hour=minute // 60, minute=minute % 60)
         except ValueError:
-            logger.warning(f"Invalid time format for {med['med_name']}: {time_str}")
+            logger.warning(f"Invalid time format for {med['med_name']}: {med['med_time']}")
 
 
 # Initial load and schedule
@@ -318,16 +319,25 @@ else:
 # --- Timetable ---
 st.subheader("📅 Medication Timetable")
 if meds:
-    timetable = sorted(meds, key=lambda m: m['med_time'])
+    regimen, invalid_meds = Regimen.load_dicts(meds)
+    timetable = regimen.timetable()
 
     # Create a formatted table
     timetable_data = []
     for m in timetable:
         timetable_data.append({
-            "Medication": m['med_name'],
-            "Time": m['med_time'],
-            "Amount": f"{m['med_amt']} pill(s)",
-            "Restrictions": m['diet_restrictions'] or "None"
+            "Medication": m.name,
+            "Time": m.time,
+            "Amount": f"{m.amount} pill(s)",
+            "Restrictions": m.diet_restrictions or "None"
+        })
+    # Entries that could not be parsed are still listed, at the end
+    for m in invalid_meds:
+        timetable_data.append({
+            "Medication": m.get('med_name', "Unknown"),
+            "Time": f"{m.get('med_time')} (invalid entry)",
+            "Amount": f"{m.get('med_amt')} pill(s)",
+            "Restrictions": m.get('diet_restrictions') or "None"
         })
 
     st.dataframe(timetable_data, use_container_width=True)
@@ -335,10 +345,38 @@ if meds:
     # Also show a visual timeline
     st.subheader("🕒 Daily Schedule")
     for m in timetable:
-        st.write(f"**{m['med_time']}** - {m['med_amt']} {m['med_name']}")
+        st.write(f"**{m.time}** - {m.amount} {m.name}")
+    for m in invalid_meds:
+        st.write(f"**{m.get('med_time')} (invalid entry)** - {m.get('med_amt')} {m.get('med_name', 'Unknown')}")
 else:
     st.info("No medications scheduled yet.")
 
+# --- Dose Spacing ---
+# Reuses the regimen built for the timetable above
+if st.session_state.check_interactions and meds:
+    spacing_conflicts = find_spacing_conflicts(regimen)
+
+    if spacing_conflicts:
+        st.subheader("⏱️ Dose Spacing")
+        for conflict in spacing_conflicts:
+            first, second = conflict['first'], conflict['second']
+            st.warning(
+                f"{regimen.names[first]} ({format_time(regimen.minutes[first])}) and "
+                f"{regimen.names[second]} ({format_time(regimen.minutes[second])}) are {conflict['gap']} min apart; "
+                f"they should be at least {conflict['required']} min apart."
+            )
+
+        changes, unresolved = propose_schedule(regimen)
+        if changes:
+            st.write("**Suggested times:**")
+            for idx, minute in sorted(changes.items(), key=lambda item: item[1]):
+                st.write(f"{regimen.names[idx]}: {format_time(regimen.minutes[idx])} → {format_time(minute)}")
+        for idx in unresolved:
+            st.error(
+                f"Could not find a time between 06:00 and 23:00 for {regimen.names[idx]} that keeps it "
+                f"far enough from your other doses; please ask your pharmacist."
+            )
+
 # --- Interaction Report ---
 if st.session_state.check_interactions and meds:
     st.subheader("📋 Interaction Report")
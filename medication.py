@@ -0,0 +1,240 @@
+import logging
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+MAX_AMOUNT = 2 ** (8 * array('I').itemsize) - 1  # Largest value the unsigned 'I' amount column holds
+
+
+# ==============================
+# Time Helpers
+def parse_time(time_str):
+    """Convert an "HH:MM" string to minutes since midnight"""
+    try:
+        hour, minute = time_str.split(":")
+        hour, minute = int(hour), int(minute)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid time format: {time_str!r}")
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Invalid time format: {time_str!r}")
+    return hour * 60 + minute
+
+
+def format_time(minute_of_day):
+    """Convert minutes since midnight back to an "HH:MM" string"""
+    return f"{minute_of_day // 60:02d}:{minute_of_day % 60:02d}"
+
+
+def parse_amount(amount):
+    """Validate a pill count; only whole, non-negative numbers are accepted"""
+    if isinstance(amount, bool) or not isinstance(amount, int) or not (0 <= amount <= MAX_AMOUNT):
+        raise ValueError(f"Invalid amount: {amount!r}")
+    return amount
+
+
+# ==============================
+# Drug IDs
+# Every distinct (case-insensitive) drug name gets a small integer ID so that
+# lookups such as the spacing rules can compare and cache on an int instead of
+# re-normalising the name. The registry is shared by all sessions (Streamlit
+# runs each one in its own thread), so writes are serialised by a lock. It
+# keeps every distinct name it has seen for the life of the process, so it
+# grows with the number of distinct free-text names entered.
+_drug_ids = {}
+_drug_names = []
+_drug_lock = threading.Lock()
+
+
+def intern_drug(name):
+    """Return the integer ID for a drug name, assigning one if needed"""
+    key = sys.intern(name.strip().lower())
+    drug_id = _drug_ids.get(key)
+    if drug_id is None:
+        with _drug_lock:
+            drug_id = _drug_ids.get(key)
+            if drug_id is None:
+                _drug_names.append(key)
+                drug_id = len(_drug_names) - 1
+                _drug_ids[key] = drug_id
+    return drug_id
+
+
+def drug_name(drug_id):
+    """Return the normalised (lower-case) drug name for an ID"""
+    return _drug_names[drug_id]
+
+
+# ==============================
+# Medication Record
+class Medication:
+    """A single scheduled medication, stored compactly"""
+
+    __slots__ = ("name", "drug_id", "amount", "minute", "diet_restrictions")
+
+    def __init__(self, name, amount, minute, diet_restrictions=""):
+        self.name = sys.intern(name)
+        self.drug_id = intern_drug(name)
+        self.amount = parse_amount(amount)
+        self.minute = int(minute)
+        self.diet_restrictions = diet_restrictions or ""
+
+    @property
+    def time(self):
+        return format_time(self.minute)
+
+    @classmethod
+    def from_dict(cls, med):
+        """Build a record from a meds.json entry; raises ValueError on a missing or bad field"""
+        for field in ('med_name', 'med_amt', 'med_time'):
+            if field not in med:
+                raise ValueError(f"Missing field: {field!r}")
+        if not isinstance(med['med_name'], str):
+            raise ValueError(f"Invalid name: {med['med_name']!r}")
+        return cls(
+            med['med_name'],
+            med['med_amt'],
+            parse_time(med['med_time']),
+            med.get('diet_restrictions', ""),
+        )
+
+    def to_dict(self):
+        """Convert back to the meds.json entry format"""
+        return {
+            "med_name": self.name,
+            "med_amt": self.amount,
+            "med_time": self.time,
+            "diet_restrictions": self.diet_restrictions
+        }
+
+    def _key(self):
+        return self.name, self.amount, self.minute, self.diet_restrictions
+
+    def __eq__(self, other):
+        if not isinstance(other, Medication):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"Medication({self.name!r}, {self.amount}, {self.time!r}, {self.diet_restrictions!r})"
+
+
+# ==============================
+# Regimen (struct-of-arrays)
+class Regimen:
+    """All medications for one patient, kept as parallel arrays.
+
+    Drug IDs, amounts and dose times live in typed ``array`` columns instead
+    of a dict per medication. Display names and diet restrictions are still
+    kept as lists of strings (names are interned, so repeats share one
+    object). Ordering and time-window queries only touch the ``minutes``
+    column.
+    """
+
+    __slots__ = ("names", "drug_ids", "amounts", "minutes", "diet_restrictions", "_order", "_sorted_minutes")
+
+    def __init__(self, meds=()):
+        self.names = []
+        self.drug_ids = array('I')
+        self.amounts = array('I')
+        self.minutes = array('H')
+        self.diet_restrictions = []
+        self._order = None
+        self._sorted_minutes = None
+        for med in meds:
+            self.append(med)
+
+    @classmethod
+    def load_dicts(cls, meds):
+        """Build a regimen from meds.json entries.
+
+        Returns ``(regimen, invalid)`` where ``invalid`` holds the entries that
+        could not be converted, in their original order.
+        """
+        regimen = cls()
+        invalid = []
+        for med in meds:
+            try:
+                regimen.append(Medication.from_dict(med))
+            except ValueError as e:
+                logger.warning(f"Skipping medication {med.get('med_name')!r}: {e}")
+                invalid.append(med)
+        return regimen, invalid
+
+    @classmethod
+    def from_dicts(cls, meds):
+        """Build a regimen from meds.json entries, skipping invalid ones"""
+        return cls.load_dicts(meds)[0]
+
+    def to_dicts(self):
+        return [med.to_dict() for med in self]
+
+    def append(self, med):
+        self.names.append(med.name)
+        self.drug_ids.append(med.drug_id)
+        self.amounts.append(med.amount)
+        self.minutes.append(med.minute)
+        self.diet_restrictions.append(med.diet_restrictions)
+        self._invalidate()
+
+    def pop(self, idx=-1):
+        med = self[idx]
+        del self.names[idx]
+        del self.drug_ids[idx]
+        del self.amounts[idx]
+        del self.minutes[idx]
+        del self.diet_restrictions[idx]
+        self._invalidate()
+        return med
+
+    def _invalidate(self):
+        self._order = None
+        self._sorted_minutes = None
+
+    def __len__(self):
+        return len(self.minutes)
+
+    def __getitem__(self, idx):
+        med = Medication.__new__(Medication)
+        med.name = self.names[idx]
+        med.drug_id = self.drug_ids[idx]
+        med.amount = self.amounts[idx]
+        med.minute = self.minutes[idx]
+        med.diet_restrictions = self.diet_restrictions[idx]
+        return med
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    # --- Time queries ---
+    def order(self):
+        """Indices of the medications sorted by dose time (stable)"""
+        if self._order is None:
+            self._order = array('I', sorted(range(len(self)), key=self.minutes.__getitem__))
+            self._sorted_minutes = array('H', (self.minutes[i] for i in self._order))
+        return self._order
+
+    def timetable(self):
+        """Medications in dose-time order"""
+        return [self[i] for i in self.order()]
+
+    def due_between(self, start, end):
+        """Indices of doses with start <= minute < end, wrapping past midnight"""
+        order = self.order()
+        sorted_minutes = self._sorted_minutes
+        lo = bisect_left(sorted_minutes, start)
+        if start <= end:
+            hi = bisect_left(sorted_minutes, end)
+            return list(order[lo:hi])
+        return list(order[lo:]) + list(order[:bisect_left(sorted_minutes, end)])
+
+    def due_at(self, minute):
+        """Indices of doses scheduled at exactly this minute"""
+        return self.due_between(minute, (minute + 1) % MINUTES_PER_DAY)
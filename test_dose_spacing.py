@@ -0,0 +1,114 @@
+from dose_spacing import MIN_REPEAT_GAP, _circular_gap, find_spacing_conflicts, propose_schedule, spacing_rules
+from medication import Regimen, format_time, parse_time
+
+
+def make_regimen(*doses):
+    return Regimen.from_dicts([
+        {"med_name": name, "med_amt": 1, "med_time": time, "diet_restrictions": ""}
+        for name, time in doses
+    ])
+
+
+def apply_changes(regimen, changes):
+    return make_regimen(*(
+        (regimen.names[idx], format_time(changes.get(idx, regimen.minutes[idx])))
+        for idx in range(len(regimen))
+    ))
+
+
+def assert_valid_schedule(regimen, changes, unresolved=()):
+    rescheduled = apply_changes(regimen, changes)
+    assert [c for c in find_spacing_conflicts(rescheduled)
+            if c["first"] not in unresolved and c["second"] not in unresolved] == []
+    # Repeated doses of one drug stay distinct and keep a sensible gap
+    for i in range(len(regimen)):
+        for j in range(i + 1, len(regimen)):
+            if regimen.drug_ids[i] != regimen.drug_ids[j] or (i not in changes and j not in changes):
+                continue
+            original_gap = _circular_gap(regimen.minutes[i], regimen.minutes[j])
+            new_gap = _circular_gap(rescheduled.minutes[i], rescheduled.minutes[j])
+            assert new_gap > 0
+            assert new_gap >= min(original_gap, MIN_REPEAT_GAP)
+
+
+def conflict_pairs(regimen):
+    return [(regimen.names[c["first"]], regimen.names[c["second"]], c["gap"])
+            for c in find_spacing_conflicts(regimen)]
+
+
+def test_window_crossing_midnight():
+    regimen = make_regimen(("Antacids", "23:30"), ("Digoxin", "01:00"))
+    assert conflict_pairs(regimen) == [("Antacids", "Digoxin", 90)]
+
+
+def test_gap_equal_to_required_is_not_flagged():
+    assert spacing_rules[("iron", "levothyroxine")] == 240
+    assert conflict_pairs(make_regimen(("Iron", "08:00"), ("Levothyroxine", "12:00"))) == []
+    # Same boundary across midnight
+    assert conflict_pairs(make_regimen(("Antacids", "23:00"), ("Digoxin", "01:00"))) == []
+
+
+def test_multiple_doses_of_same_drug():
+    regimen = make_regimen(("Iron", "08:00"), ("Iron", "20:00"), ("Levothyroxine", "07:00"))
+    # Only the morning iron dose is too close; the two iron doses never conflict with each other
+    assert conflict_pairs(regimen) == [("Iron", "Levothyroxine", 60)]
+
+
+def test_unresolved_when_no_compatible_time():
+    regimen = make_regimen(("Levothyroxine", "08:00"), ("Iron", "08:00"))
+    changes, unresolved = propose_schedule(regimen, earliest="08:00", latest="09:00")
+    assert changes == {}
+    assert [regimen.names[idx] for idx in unresolved] == ["Iron"]
+
+
+def test_unresolved_dose_does_not_block_others():
+    regimen = make_regimen(("Levothyroxine", "08:00"), ("Iron", "08:00"), ("Calcium", "08:00"))
+    changes, unresolved = propose_schedule(regimen, earliest="08:00", latest="12:00")
+    # Only one of iron/calcium fits 4 h after levothyroxine; the one set aside
+    # must not stop the other from moving there
+    assert len(unresolved) == 1
+    assert regimen.names[unresolved[0]] in ("Iron", "Calcium")
+    assert list(changes.values()) == [parse_time("12:00")]
+    assert_valid_schedule(regimen, changes, unresolved)
+
+
+def test_proposed_schedule_satisfies_all_rules():
+    regimen = make_regimen(
+        ("Levothyroxine", "07:00"), ("Iron", "08:00"), ("Calcium", "07:30"), ("Calcium", "19:00"),
+        ("Ciprofloxacin", "09:00"), ("Antacids", "23:30"), ("Digoxin", "00:30"), ("Warfarin", "21:00"),
+    )
+    assert find_spacing_conflicts(regimen)
+
+    changes, unresolved = propose_schedule(regimen, step=15, earliest="06:00", latest="23:00")
+    assert unresolved == []
+    assert changes
+    for minute in changes.values():
+        assert parse_time("06:00") <= minute <= parse_time("23:00")
+        assert minute % 15 == 0
+    assert_valid_schedule(regimen, changes)
+
+
+def test_repeated_doses_are_not_stacked():
+    regimen = make_regimen(("Iron", "08:00"), ("Levothyroxine", "10:00"), ("Iron", "12:00"))
+    changes, unresolved = propose_schedule(regimen)
+    assert unresolved == []
+    # Moving levothyroxine alone is enough; both iron doses keep their times
+    assert changes == {1: parse_time("16:00")}
+    assert_valid_schedule(regimen, changes)
+
+
+def test_moves_earlier_doses_when_needed():
+    # Keeping doses in time order and never revisiting them fails here
+    regimen = make_regimen(("Calcium", "15:00"), ("Ciprofloxacin", "11:00"), ("Antacids", "14:00"))
+    changes, unresolved = propose_schedule(regimen, step=60, earliest="06:00", latest="13:00")
+    assert unresolved == []
+    assert len(changes) == 1
+    assert_valid_schedule(regimen, changes)
+
+
+def test_crowded_schedule_is_fully_resolved():
+    names = ["Iron", "Calcium", "Levothyroxine", "Antacids", "Ciprofloxacin", "Digoxin"] * 2
+    regimen = make_regimen(*((name, "08:00") for name in names))
+    changes, unresolved = propose_schedule(regimen)
+    assert unresolved == []
+    assert_valid_schedule(regimen, changes)
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from medication import MAX_AMOUNT, Medication, Regimen, format_time, parse_amount, parse_time
+
+
+def med_dict(name, time, amount=1, diet_restrictions=""):
+    return {"med_name": name, "med_amt": amount, "med_time": time, "diet_restrictions": diet_restrictions}
+
+
+def test_parse_and_format_time():
+    assert parse_time("00:00") == 0
+    assert parse_time("08:05") == 485
+    assert parse_time("23:59") == 1439
+    assert format_time(485) == "08:05"
+
+
+@pytest.mark.parametrize("time_str", ["24:00", "12:60", "-1:00", "8", "08:00:00", "noon", "", None, 800])
+def test_parse_time_rejects_bad_input(time_str):
+    with pytest.raises(ValueError, match="Invalid time format"):
+        parse_time(time_str)
+
+
+@pytest.mark.parametrize("amount", [-1, 1.5, 2.0, "two", "2", True, None, MAX_AMOUNT + 1])
+def test_parse_amount_rejects_bad_input(amount):
+    with pytest.raises(ValueError, match="Invalid amount"):
+        parse_amount(amount)
+
+
+def test_parse_amount_accepts_whole_numbers():
+    assert parse_amount(0) == 0
+    assert parse_amount(3) == 3
+    assert parse_amount(MAX_AMOUNT) == MAX_AMOUNT
+
+
+def test_round_trip_to_meds_json():
+    meds = [
+        med_dict("Warfarin", "21:00", 1, ""),
+        med_dict("Iron", "08:00", 2, "avoid tea"),
+        med_dict("Levothyroxine", "06:30", 1, ""),
+    ]
+    regimen = Regimen.from_dicts(meds)
+    assert regimen.to_dicts() == meds
+    assert json.loads(json.dumps(regimen.to_dicts())) == meds
+    assert [Medication.from_dict(med).to_dict() for med in meds] == meds
+
+
+def test_medication_is_hashable():
+    first = Medication.from_dict(med_dict("Iron", "08:00"))
+    second = Medication.from_dict(med_dict("Iron", "08:00"))
+    assert first == second
+    assert len({first, second}) == 1
+
+
+def test_load_dicts_splits_invalid_entries():
+    meds = [
+        med_dict("Warfarin", "21:00"),
+        med_dict("Bad time", "25:00"),
+        med_dict("Bad amount", "08:00", amount=-1),
+        {"med_name": "No amount", "med_time": "09:00"},
+        med_dict("Iron", "08:00"),
+    ]
+    regimen, invalid = Regimen.load_dicts(meds)
+    assert regimen.names == ["Warfarin", "Iron"]
+    assert invalid == meds[1:4]
+
+
+def test_timetable_sorted_by_time():
+    regimen = Regimen.from_dicts([med_dict("B", "21:00"), med_dict("A", "08:00"), med_dict("C", "12:00")])
+    assert [med.name for med in regimen.timetable()] == ["A", "C", "B"]
+
+
+def test_due_between_and_due_at():
+    regimen = Regimen.from_dicts([
+        med_dict("Evening", "21:00"), med_dict("Late", "23:59"),
+        med_dict("Midnight", "00:00"), med_dict("Morning", "08:00"),
+    ])
+    assert regimen.due_between(parse_time("07:00"), parse_time("22:00")) == [3, 0]
+    # Window wrapping past midnight
+    assert regimen.due_between(parse_time("22:00"), parse_time("01:00")) == [1, 2]
+    assert regimen.due_at(parse_time("23:59")) == [1]
+    assert regimen.due_at(parse_time("00:00")) == [2]
+    assert regimen.due_at(parse_time("12:00")) == []
+
+
+def test_pop_keeps_columns_and_order_in_sync():
+    regimen = Regimen.from_dicts([med_dict("A", "08:00"), med_dict("B", "07:00", 2), med_dict("C", "09:00")])
+    assert regimen.due_at(parse_time("07:00")) == [1]
+    assert regimen.pop(1) == Medication.from_dict(med_dict("B", "07:00", 2))
+    assert len(regimen) == 2
+    assert regimen.to_dicts() == [med_dict("A", "08:00"), med_dict("C", "09:00")]
+    assert regimen.due_at(parse_time("07:00")) == []
+    assert regimen.due_at(parse_time("09:00")) == [1]